@@ -7,6 +7,7 @@ from pinecone import Pinecone
 from sentence_transformers import SentenceTransformer
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.schema import HumanMessage
+from compressed_index import load_compressed_index, query_compressed_index
 
 st.set_page_config(
     page_title="Fitness AI Chatbot",
@@ -17,10 +18,19 @@ st.set_page_config(
 # Load environment variables
 load_dotenv()
 
-# Initialize Pinecone
-pc = Pinecone(api_key=os.environ.get("PINECONE_API_KEY"))
-index_name = "fitness-chatbot-enhanced"
-index = pc.Index(index_name)
+# Use the local compressed index when one is configured, otherwise Pinecone
+compressed_index_dir = os.environ.get("COMPRESSED_INDEX_DIR")
+
+@st.cache_resource
+def load_local_index(index_dir):
+    return load_compressed_index(index_dir)
+
+if compressed_index_dir:
+    local_index = load_local_index(compressed_index_dir)
+else:
+    pc = Pinecone(api_key=os.environ.get("PINECONE_API_KEY"))
+    index_name = "fitness-chatbot-enhanced"
+    index = pc.Index(index_name)
 
 # Initialize the embedding model
 @st.cache_resource
@@ -34,6 +44,8 @@ llm = ChatGoogleGenerativeAI(model="gemini-1.5-pro")
 
 def process_query(query, top_k=6):
     query_embedding = embed_model.encode(query).tolist()
+    if compressed_index_dir:
+        return query_compressed_index(local_index, query_embedding, top_k=top_k)
     results = index.query(vector=query_embedding, top_k=top_k, include_metadata=True)
     return results
 
@@ -0,0 +1,71 @@
+import json
+import os
+from typing import List, Dict
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+import re
+
+def load_json_file(file_path: str) -> Dict:
+    """Load a JSON file and return its contents as a dictionary."""
+    with open(file_path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def clean_text(text: str) -> str:
+    """Clean the text by removing extra whitespace and certain patterns."""
+    # Remove extra whitespace
+    text = re.sub(r'\s+', ' ', text.strip())
+    # Add more cleaning steps as needed
+    return text
+
+def split_transcript(transcript: str, max_tokens: int = 512, chunk_overlap: int = 100) -> List[str]:
+    """Split the transcript into chunks."""
+    # Assuming 1 token is approximately 4 characters
+    chunk_size = max_tokens * 4
+    
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        separators=["\n\n", "\n", ". ", "!", "?", ",", " ", ""],
+        keep_separator=False,
+    )
+    
+    return text_splitter.split_text(transcript)
+
+def create_enriched_chunks(video_data: Dict, max_tokens: int = 512, chunk_overlap: int = 100) -> List[Dict]:
+    """Create enriched chunks from video data."""
+    transcript = clean_text(video_data['transcript'])
+    chunks = split_transcript(transcript, max_tokens, chunk_overlap)
+    
+    enriched_chunks = []
+    for i, chunk in enumerate(chunks):
+        enriched_chunk = {
+            "content": chunk,
+            "metadata": {
+                "video_id": video_data["id"],
+                "title": video_data["title"],
+                "upload_date": video_data["upload_date"],
+                "chunk_number": f"{i+1} of {len(chunks)}",
+                "thumbnail_url": video_data["thumbnail_url"]
+            }
+        }
+        enriched_chunks.append(enriched_chunk)
+    
+    return enriched_chunks
+
+def process_all_videos(input_directory: str, output_directory: str, max_tokens: int = 512, chunk_overlap: int = 100):
+    """Process all video JSON files in the input directory and save enriched chunks."""
+    if not os.path.exists(output_directory):
+        os.makedirs(output_directory)
+
+    for filename in os.listdir(input_directory):
+        if filename.endswith('.json'):
+            input_path = os.path.join(input_directory, filename)
+            output_path = os.path.join(output_directory, f"enriched_{filename}")
+            
+            video_data = load_json_file(input_path)
+            enriched_chunks = create_enriched_chunks(video_data, max_tokens, chunk_overlap)
+            
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump(enriched_chunks, f, ensure_ascii=False, indent=2)
+
+    print(f"Processed files saved in {output_directory}")
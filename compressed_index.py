@@ -0,0 +1,362 @@
+import argparse
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Full-precision vectors are only read for the rescoring pass, so they are kept
+# in their own .npy file and memory-mapped instead of loaded with the codes.
+VECTORS_FILE = "vectors.npy"
+CODES_FILE = "codes.npy"
+INT8_SCALE_FILE = "int8_scale.npy"
+PQ_CODEBOOKS_FILE = "pq_codebooks.npy"
+CHUNKS_FILE = "chunks.json"
+VIDEOS_FILE = "videos.json"
+CONFIG_FILE = "config.json"
+
+# Rows scanned at a time when scoring int8 codes. Each block is upcast into a
+# reused float32 buffer, which stays small enough to remain in cache, so the
+# first pass never materialises a float copy of the whole matrix.
+SCAN_BLOCK_SIZE = 256
+
+
+def load_chunk_files(input_dir: str) -> List[Dict]:
+    """Load every enriched chunk file written by process_all_videos."""
+    chunks = []
+    for filename in sorted(os.listdir(input_dir)):
+        if filename.endswith('.json'):
+            with open(os.path.join(input_dir, filename), 'r', encoding='utf-8') as f:
+                chunks.extend(json.load(f))
+    return chunks
+
+
+def intern_metadata(chunks: List[Dict]) -> Tuple[Dict[str, Dict], List[Dict]]:
+    """Split chunk metadata into a per-video table and slim per-chunk rows.
+
+    Title, upload date and thumbnail are identical for every chunk of a video,
+    so they are stored once per video instead of being copied onto each chunk.
+    """
+    videos = {}
+    rows = []
+    for chunk in chunks:
+        metadata = chunk['metadata']
+        video_id = metadata['video_id']
+        if video_id not in videos:
+            videos[video_id] = {
+                "title": metadata.get("title"),
+                "upload_date": metadata.get("upload_date"),
+                "thumbnail_url": metadata.get("thumbnail_url"),
+            }
+        rows.append({
+            "video_id": video_id,
+            "chunk_number": metadata.get("chunk_number"),
+            "text": chunk.get("content", ""),
+        })
+    return videos, rows
+
+
+def normalize_vectors(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalise rows so dot products equal cosine similarity."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-dimension scalar quantisation to int8."""
+    scale = np.abs(vectors).max(axis=0) / 127.0
+    scale[scale == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scale), -127, 127).astype(np.int8)
+    return codes, scale.astype(np.float32)
+
+
+def int8_scores(codes: np.ndarray, scale: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Approximate dot products between a query and int8 codes."""
+    # Folding the scale into the query keeps the scan to one matmul per block.
+    scaled_query = (query * scale).astype(np.float32)
+    scores = np.empty(len(codes), dtype=np.float32)
+    buffer = np.empty((min(SCAN_BLOCK_SIZE, len(codes)), codes.shape[1]), dtype=np.float32)
+    for start in range(0, len(codes), SCAN_BLOCK_SIZE):
+        block = codes[start:start + SCAN_BLOCK_SIZE]
+        rows = len(block)
+        np.copyto(buffer[:rows], block)
+        np.dot(buffer[:rows], scaled_query, out=scores[start:start + rows])
+    return scores
+
+
+def _kmeans(data: np.ndarray, num_centroids: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """Plain Lloyd's k-means, used to train each product-quantisation codebook."""
+    centroids = data[rng.choice(len(data), num_centroids, replace=False)].copy()
+    for _ in range(iterations):
+        # ||x||^2 is the same for every centroid, so it is left out of the argmin
+        distances = data @ (-2 * centroids.T) + (centroids ** 2).sum(axis=1)
+        assignments = distances.argmin(axis=1)
+        counts = np.bincount(assignments, minlength=num_centroids)
+        sums = np.stack([
+            np.bincount(assignments, weights=data[:, j], minlength=num_centroids)
+            for j in range(data.shape[1])
+        ], axis=1)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty clusters so every code is usable
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = data[rng.integers(len(data), size=len(empty))]
+    return centroids
+
+
+def train_pq(vectors: np.ndarray, num_subvectors: int = 96, num_centroids: int = 256,
+             iterations: int = 20, sample_size: int = 20000, seed: int = 0) -> np.ndarray:
+    """Train one codebook per subvector; returns (num_subvectors, num_centroids, sub_dim)."""
+    dim = vectors.shape[1]
+    if dim % num_subvectors != 0:
+        raise ValueError(f"Dimension {dim} is not divisible by {num_subvectors} subvectors")
+    rng = np.random.default_rng(seed)
+    if len(vectors) > sample_size:
+        vectors = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    num_centroids = min(num_centroids, 256, len(vectors))
+    sub_dim = dim // num_subvectors
+
+    codebooks = np.empty((num_subvectors, num_centroids, sub_dim), dtype=np.float32)
+    for m in range(num_subvectors):
+        subvectors = vectors[:, m * sub_dim:(m + 1) * sub_dim]
+        codebooks[m] = _kmeans(subvectors, num_centroids, iterations, rng)
+    return codebooks
+
+
+def encode_pq(vectors: np.ndarray, codebooks: np.ndarray) -> np.ndarray:
+    """Assign each subvector to its nearest centroid; one uint8 code per subvector."""
+    num_subvectors, _, sub_dim = codebooks.shape
+    codes = np.empty((len(vectors), num_subvectors), dtype=np.uint8)
+    for m in range(num_subvectors):
+        subvectors = vectors[:, m * sub_dim:(m + 1) * sub_dim]
+        centroids = codebooks[m]
+        distances = -2 * subvectors @ centroids.T + (centroids ** 2).sum(axis=1)
+        codes[:, m] = distances.argmin(axis=1)
+    return codes
+
+
+def pq_scores(codes: np.ndarray, codebooks: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Approximate dot products via per-subvector lookup tables."""
+    num_subvectors, _, sub_dim = codebooks.shape
+    lookup = np.einsum('mkd,md->mk', codebooks, query.reshape(num_subvectors, sub_dim))
+    scores = np.zeros(len(codes), dtype=np.float32)
+    for m in range(num_subvectors):
+        scores += lookup[m, codes[:, m]]
+    return scores
+
+
+def compress_vectors(vectors: np.ndarray, method: str = "int8", num_subvectors: int = 96) -> Dict:
+    """Build the first-pass codes for the chosen method."""
+    if method == "int8":
+        codes, scale = quantize_int8(vectors)
+        return {"method": method, "codes": codes, "scale": scale}
+    if method == "pq":
+        codebooks = train_pq(vectors, num_subvectors=num_subvectors)
+        return {"method": method, "codes": encode_pq(vectors, codebooks), "codebooks": codebooks}
+    raise ValueError(f"Unknown compression method: {method}")
+
+
+def approximate_scores(compressed: Dict, query: np.ndarray) -> np.ndarray:
+    if compressed["method"] == "int8":
+        return int8_scores(compressed["codes"], compressed["scale"], query)
+    return pq_scores(compressed["codes"], compressed["codebooks"], query)
+
+
+def search(compressed: Dict, vectors: np.ndarray, query: np.ndarray,
+           top_k: int = 6, num_candidates: int = 60) -> Tuple[np.ndarray, np.ndarray]:
+    """Shortlist with compressed codes, then rescore the shortlist at full precision.
+
+    Returns (row_ids, scores) for the top_k rows, best first.
+    """
+    query = np.asarray(query, dtype=np.float32)
+    if len(compressed["codes"]) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    scores = approximate_scores(compressed, query)
+    num_candidates = min(max(num_candidates, top_k), len(scores))
+    candidates = np.argpartition(-scores, num_candidates - 1)[:num_candidates]
+    # Sorted ids keep reads from the memory-mapped vectors sequential
+    candidates.sort()
+    exact = np.asarray(vectors[candidates], dtype=np.float32) @ query
+    order = np.argsort(-exact)[:top_k]
+    return candidates[order], exact[order]
+
+
+def build_compressed_index(input_dir: str, output_dir: str, model, method: str = "int8",
+                           num_subvectors: int = 96, metric: str = "cosine", batch_size: int = 64):
+    """Embed enriched chunks and write a compressed index directory."""
+    os.makedirs(output_dir, exist_ok=True)
+
+    chunks = load_chunk_files(input_dir)
+    videos, rows = intern_metadata(chunks)
+    print(f"Embedding {len(rows)} chunks from {len(videos)} videos")
+
+    vectors = model.encode([row["text"] for row in rows], batch_size=batch_size,
+                           show_progress_bar=True).astype(np.float32)
+    if metric == "cosine":
+        vectors = normalize_vectors(vectors)
+
+    compressed = compress_vectors(vectors, method, num_subvectors)
+
+    np.save(os.path.join(output_dir, VECTORS_FILE), vectors)
+    np.save(os.path.join(output_dir, CODES_FILE), compressed["codes"])
+    if method == "int8":
+        np.save(os.path.join(output_dir, INT8_SCALE_FILE), compressed["scale"])
+    else:
+        np.save(os.path.join(output_dir, PQ_CODEBOOKS_FILE), compressed["codebooks"])
+    with open(os.path.join(output_dir, CHUNKS_FILE), 'w', encoding='utf-8') as f:
+        json.dump(rows, f, ensure_ascii=False)
+    with open(os.path.join(output_dir, VIDEOS_FILE), 'w', encoding='utf-8') as f:
+        json.dump(videos, f, ensure_ascii=False)
+    with open(os.path.join(output_dir, CONFIG_FILE), 'w', encoding='utf-8') as f:
+        json.dump({"method": method, "metric": metric}, f)
+
+    print(f"Compressed index ({method}) saved in {output_dir}")
+
+
+def load_compressed_index(index_dir: str) -> Dict:
+    """Load codes and metadata tables; full-precision vectors stay memory-mapped."""
+    with open(os.path.join(index_dir, CONFIG_FILE), 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    compressed = {"method": config["method"], "codes": np.load(os.path.join(index_dir, CODES_FILE))}
+    if config["method"] == "int8":
+        compressed["scale"] = np.load(os.path.join(index_dir, INT8_SCALE_FILE))
+    else:
+        compressed["codebooks"] = np.load(os.path.join(index_dir, PQ_CODEBOOKS_FILE))
+    with open(os.path.join(index_dir, CHUNKS_FILE), 'r', encoding='utf-8') as f:
+        rows = json.load(f)
+    with open(os.path.join(index_dir, VIDEOS_FILE), 'r', encoding='utf-8') as f:
+        videos = json.load(f)
+    return {
+        "metric": config["metric"],
+        "compressed": compressed,
+        "vectors": np.load(os.path.join(index_dir, VECTORS_FILE), mmap_mode='r'),
+        "chunks": rows,
+        "videos": videos,
+    }
+
+
+def query_compressed_index(index: Dict, query_vector, top_k: int = 6, num_candidates: int = 60) -> Dict:
+    """Query the local index; results have the same shape as a Pinecone query."""
+    query = np.asarray(query_vector, dtype=np.float32)
+    if index["metric"] == "cosine":
+        query = normalize_vectors(query)
+    row_ids, scores = search(index["compressed"], index["vectors"], query, top_k, num_candidates)
+
+    matches = []
+    for row_id, score in zip(row_ids, scores):
+        row = index["chunks"][row_id]
+        metadata = dict(index["videos"][row["video_id"]])
+        metadata.update(row)
+        matches.append({
+            "id": f"{row['video_id']}_{row['chunk_number']}",
+            "score": float(score),
+            "metadata": metadata,
+        })
+    return {"matches": matches}
+
+
+def memory_recall_report(vectors: np.ndarray, queries: Optional[np.ndarray] = None, top_k: int = 6,
+                         subvector_options=(48, 96, 192), candidate_multipliers=(1, 5, 10, 20),
+                         num_queries: int = 300, seed: int = 0) -> List[Dict]:
+    """Compare memory footprint and recall@top_k against exact float32 search.
+
+    Without explicit queries, num_queries chunk vectors are held out of the
+    corpus and used as queries, so recall is averaged over enough neighbours
+    to tell settings apart. Recall is measured against a brute-force float32
+    scan of the same vectors, which is also reported as the baseline row.
+    Resident bytes are what the first pass keeps in memory (codes plus the
+    scale or codebooks, amortised per vector); disk bytes also include the
+    float32 vectors kept for rescoring, so compression never shrinks the
+    index on disk.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if queries is None:
+        held_out = np.zeros(len(vectors), dtype=bool)
+        held_out[np.random.default_rng(seed).choice(len(vectors), min(num_queries, len(vectors) // 2),
+                                                    replace=False)] = True
+        queries, vectors = vectors[held_out], vectors[~held_out]
+    queries = np.asarray(queries, dtype=np.float32)
+    float_bytes = vectors.shape[1] * 4
+
+    start_time = time.time()
+    exact_top = [set(np.argsort(-(vectors @ q))[:top_k]) for q in queries]
+    query_time = (time.time() - start_time) / len(queries)
+    report = [{
+        "setting": "float32",
+        "candidates": top_k,
+        "resident_bytes_per_vector": float_bytes,
+        "disk_bytes_per_vector": float_bytes,
+        "compression_ratio": 1.0,
+        "recall": 1.0,
+        "query_ms": query_time * 1000,
+        "build_s": 0.0,
+    }]
+
+    settings = [("int8", None)] + [("pq", m) for m in subvector_options if vectors.shape[1] % m == 0]
+    for method, num_subvectors in settings:
+        start_time = time.time()
+        compressed = compress_vectors(vectors, method, num_subvectors or 96)
+        build_time = time.time() - start_time
+
+        code_bytes = compressed["codes"].shape[1] * compressed["codes"].itemsize
+        extra_bytes = compressed["scale"].nbytes if method == "int8" else compressed["codebooks"].nbytes
+        resident_bytes = code_bytes + extra_bytes / len(vectors)
+        label = method if method == "int8" else f"pq{num_subvectors}"
+
+        for multiplier in candidate_multipliers:
+            num_candidates = top_k * multiplier
+            hits = 0
+            start_time = time.time()
+            for q, expected in zip(queries, exact_top):
+                row_ids, _ = search(compressed, vectors, q, top_k, num_candidates)
+                hits += len(expected.intersection(row_ids.tolist()))
+            query_time = (time.time() - start_time) / len(queries)
+            report.append({
+                "setting": label,
+                "candidates": num_candidates,
+                "resident_bytes_per_vector": resident_bytes,
+                "disk_bytes_per_vector": resident_bytes + float_bytes,
+                "compression_ratio": float_bytes / resident_bytes,
+                "recall": hits / (top_k * len(queries)),
+                "query_ms": query_time * 1000,
+                "build_s": build_time,
+            })
+    return report
+
+
+def print_report(report: List[Dict]):
+    print(f"{'setting':<8} {'cands':>6} {'resident B/vec':>15} {'disk B/vec':>11} {'ratio':>7} "
+          f"{'recall':>7} {'ms/query':>9}")
+    for r in report:
+        print(f"{r['setting']:<8} {r['candidates']:>6} {r['resident_bytes_per_vector']:>15.1f} "
+              f"{r['disk_bytes_per_vector']:>11.1f} {r['compression_ratio']:>6.1f}x {r['recall']:>7.3f} "
+              f"{r['query_ms']:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a compressed vector index and report its memory/recall trade-off")
+    parser.add_argument("--chunks-dir", default="data/raw/chunks", help="Enriched chunk files from process_all_videos")
+    parser.add_argument("--index-dir", default="data/compressed_index")
+    parser.add_argument("--method", choices=["int8", "pq"], default="int8")
+    parser.add_argument("--num-subvectors", type=int, default=96, help="Subvectors per vector for --method pq")
+    parser.add_argument("--model-name", default="multi-qa-mpnet-base-dot-v1")
+    parser.add_argument("--report-only", action="store_true", help="Skip the build and report on an existing index")
+    parser.add_argument("--num-queries", type=int, default=300, help="Chunk vectors held out as report queries")
+    args = parser.parse_args()
+
+    if not args.report_only:
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(args.model_name)
+        build_compressed_index(args.chunks_dir, args.index_dir, model, method=args.method,
+                               num_subvectors=args.num_subvectors)
+
+    index = load_compressed_index(args.index_dir)
+    print_report(memory_recall_report(np.asarray(index["vectors"]), num_queries=args.num_queries))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import json
+import zlib
+
+import numpy as np
+import pytest
+
+import compressed_index
+
+
+DIM = 32
+
+
+class StubModel:
+    """Deterministic stand-in for SentenceTransformer: one random vector per text."""
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        if isinstance(texts, str):
+            return self.encode([texts])[0]
+        return np.stack([
+            np.random.default_rng(zlib.crc32(text.encode())).normal(size=DIM).astype(np.float32)
+            for text in texts
+        ])
+
+
+def make_chunks(num_videos=3, chunks_per_video=4):
+    chunks = []
+    for v in range(num_videos):
+        for i in range(chunks_per_video):
+            chunks.append({
+                "content": f"video {v} chunk {i} text",
+                "metadata": {
+                    "video_id": f"vid{v}",
+                    "title": f"Title {v}",
+                    "upload_date": "2024-01-01 00:00:00",
+                    "chunk_number": f"{i+1} of {chunks_per_video}",
+                    "thumbnail_url": f"https://example.com/{v}.jpg",
+                },
+            })
+    return chunks
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    return compressed_index.normalize_vectors(rng.normal(size=(300, DIM)).astype(np.float32))
+
+
+@pytest.mark.parametrize("method", ["int8", "pq"])
+def test_search_with_all_candidates_matches_exact_top_k(vectors, method):
+    compressed = compressed_index.compress_vectors(vectors, method, num_subvectors=8)
+    for query in vectors[:10]:
+        row_ids, scores = compressed_index.search(compressed, vectors, query, top_k=5,
+                                                  num_candidates=len(vectors))
+        exact = vectors @ query
+        assert row_ids.tolist() == np.argsort(-exact)[:5].tolist()
+        np.testing.assert_allclose(scores, exact[row_ids], rtol=1e-6)
+
+
+def test_search_on_empty_index_returns_nothing():
+    empty = np.empty((0, DIM), dtype=np.float32)
+    compressed = {"method": "int8", "codes": np.empty((0, DIM), dtype=np.int8), "scale": np.ones(DIM, np.float32)}
+    row_ids, scores = compressed_index.search(compressed, empty, np.ones(DIM, np.float32))
+    assert len(row_ids) == 0 and len(scores) == 0
+
+
+def test_quantize_int8_round_trip_error_within_half_step(vectors):
+    codes, scale = compressed_index.quantize_int8(vectors)
+    assert codes.dtype == np.int8
+    error = np.abs(codes * scale - vectors)
+    assert np.all(error <= scale / 2 + 1e-6)
+
+
+def test_intern_metadata_stores_each_video_once():
+    videos, rows = compressed_index.intern_metadata(make_chunks())
+    assert sorted(videos) == ["vid0", "vid1", "vid2"]
+    assert videos["vid1"] == {
+        "title": "Title 1",
+        "upload_date": "2024-01-01 00:00:00",
+        "thumbnail_url": "https://example.com/1.jpg",
+    }
+    assert len(rows) == 12
+    assert set(rows[0]) == {"video_id", "chunk_number", "text"}
+
+
+@pytest.mark.parametrize("method", ["int8", "pq"])
+def test_build_load_query_round_trip(tmp_path, method):
+    chunks_dir = tmp_path / "chunks"
+    chunks_dir.mkdir()
+    chunks = make_chunks()
+    with open(chunks_dir / "enriched_all.json", "w", encoding="utf-8") as f:
+        json.dump(chunks, f)
+
+    model = StubModel()
+    compressed_index.build_compressed_index(str(chunks_dir), str(tmp_path / "index"), model,
+                                            method=method, num_subvectors=8)
+    index = compressed_index.load_compressed_index(str(tmp_path / "index"))
+
+    target = chunks[5]
+    results = compressed_index.query_compressed_index(index, model.encode(target["content"]), top_k=3)
+
+    # Same shape app.py reads from a Pinecone query
+    assert len(results["matches"]) == 3
+    best = results["matches"][0]
+    assert best["id"] == "vid1_2 of 4"
+    assert best["score"] == pytest.approx(1.0, abs=1e-5)
+    assert best["metadata"]["text"] == target["content"]
+    assert best["metadata"]["title"] == "Title 1"
+    assert best["metadata"]["thumbnail_url"] == "https://example.com/1.jpg"
+    assert best["metadata"]["video_id"] == "vid1"
+
+
+def test_memory_recall_report_holds_out_queries(vectors):
+    report = compressed_index.memory_recall_report(vectors, subvector_options=(8,),
+                                                   candidate_multipliers=(1, 100), num_queries=50)
+    assert [r["setting"] for r in report] == ["float32", "int8", "int8", "pq8", "pq8"]
+    # Rescoring every remaining vector recovers the exact neighbours
+    assert report[2]["recall"] == 1.0 and report[4]["recall"] == 1.0
+    assert report[1]["resident_bytes_per_vector"] < report[0]["resident_bytes_per_vector"]
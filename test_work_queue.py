@@ -0,0 +1,134 @@
+import json
+import threading
+import time
+
+import pytest
+
+import work_queue
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = work_queue.connect(str(tmp_path / "queue.db"))
+    yield conn
+    conn.close()
+
+
+def test_duplicate_enqueue_is_ignored(conn):
+    assert work_queue.enqueue(conn, "scrape", "v1", {"video_id": "v1"})
+    assert not work_queue.enqueue(conn, "scrape", "v1", {"video_id": "v1"})
+    # Same key under another stage is a different job
+    assert work_queue.enqueue(conn, "chunk", "v1", {"video_id": "v1"})
+    assert conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0] == 2
+
+
+def test_expired_lease_is_reclaimed_and_stale_holder_cannot_complete(conn):
+    work_queue.enqueue(conn, "scrape", "v1", {})
+    job = work_queue.claim_job(conn, "w1", lease_seconds=0.5)
+    assert work_queue.claim_job(conn, "w2") is None
+    time.sleep(0.6)
+
+    reclaimed = work_queue.claim_job(conn, "w2")
+    assert reclaimed["id"] == job["id"]
+    assert reclaimed["attempts"] == 2
+
+    follow_up = {"job_type": "chunk", "job_key": "v1", "payload": {}}
+    assert not work_queue.complete_job(conn, job, "w1", [follow_up])
+    assert work_queue.claim_job(conn, "w1", ["chunk"]) is None
+
+    assert work_queue.complete_job(conn, reclaimed, "w2", [follow_up])
+    assert work_queue.claim_job(conn, "w1", ["chunk"])["job_key"] == "v1"
+
+
+def test_extend_lease_keeps_job_from_being_reclaimed(conn):
+    work_queue.enqueue(conn, "embed", "v1", {})
+    job = work_queue.claim_job(conn, "w1", lease_seconds=0.05)
+    assert work_queue.extend_lease(conn, job, "w1", 60)
+    time.sleep(0.1)
+    assert work_queue.claim_job(conn, "w2") is None
+    assert not work_queue.extend_lease(conn, job, "w2", 60)
+
+
+def test_lease_renewal_stops_after_max_job_seconds(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "queue.db")
+    conn = work_queue.connect(db_path)
+    work_queue.enqueue(conn, "upsert", "v1", {})
+    release = threading.Event()
+    monkeypatch.setitem(work_queue.JOB_HANDLERS, "upsert", lambda payload: release.wait(5) and [])
+
+    worker = threading.Thread(target=work_queue.run_worker,
+                              kwargs={"db_path": db_path, "lease_seconds": 0.3, "poll_interval": 0.01,
+                                      "max_job_seconds": 0.5, "worker_id": "hung"})
+    worker.start()
+    try:
+        time.sleep(0.4)
+        # Still renewed within max_job_seconds
+        assert work_queue.claim_job(conn, "w2") is None
+        time.sleep(0.8)
+        # Renewal stopped, so the hung job's lease expired and can be taken over
+        job = work_queue.claim_job(conn, "w2")
+        assert job["job_key"] == "v1"
+        assert work_queue.complete_job(conn, job, "w2")
+    finally:
+        release.set()
+        worker.join()
+
+
+def test_seed_chunks_into_new_index_enqueues_fresh_jobs(conn, tmp_path):
+    chunks_dir = tmp_path / "chunks"
+    chunks_dir.mkdir()
+    for video_id in ("v1", "v2"):
+        (chunks_dir / f"enriched_{video_id}.json").write_text("[]")
+    payload = {"chunks_dir": str(chunks_dir), "model_name": "m", "index_name": "A"}
+
+    assert work_queue.seed_chunks(conn, payload) == 2
+    assert work_queue.seed_chunks(conn, payload) == 0
+    assert work_queue.seed_chunks(conn, {**payload, "index_name": "B"}) == 2
+
+    jobs = conn.execute("SELECT payload FROM jobs WHERE job_type = 'embed'").fetchall()
+    assert sorted(json.loads(row["payload"])["index_name"] for row in jobs) == ["A", "A", "B", "B"]
+
+
+def test_failures_back_off_then_fail_after_max_attempts(conn):
+    work_queue.enqueue(conn, "upsert", "v1", {}, max_attempts=2)
+
+    job = work_queue.claim_job(conn, "w1")
+    work_queue.fail_job(conn, job, "w1", "boom", retry_delay=0.05)
+    # Backing off: not runnable yet
+    assert work_queue.claim_job(conn, "w1") is None
+    time.sleep(0.1)
+
+    job = work_queue.claim_job(conn, "w1")
+    assert job["attempts"] == 2
+    work_queue.fail_job(conn, job, "w1", "boom again", retry_delay=0.05)
+    time.sleep(0.1)
+
+    assert work_queue.claim_job(conn, "w1") is None
+    row = conn.execute("SELECT status, last_error FROM jobs").fetchone()
+    assert (row["status"], row["last_error"]) == ("failed", "boom again")
+
+    assert work_queue.retry_failed(conn) == 1
+    assert work_queue.claim_job(conn, "w1")["attempts"] == 1
+
+
+def test_run_worker_drains_pipeline(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "queue.db")
+
+    def handler(next_stage):
+        def handle(payload):
+            return [{"job_type": next_stage, "job_key": payload["video_id"], "payload": payload}]
+        return handle
+
+    monkeypatch.setitem(work_queue.JOB_HANDLERS, "scrape", handler("chunk"))
+    monkeypatch.setitem(work_queue.JOB_HANDLERS, "chunk", handler("embed"))
+    monkeypatch.setitem(work_queue.JOB_HANDLERS, "embed", handler("upsert"))
+    monkeypatch.setitem(work_queue.JOB_HANDLERS, "upsert", lambda payload: [])
+
+    conn = work_queue.connect(db_path)
+    for i in range(5):
+        work_queue.enqueue(conn, "scrape", f"v{i}", {"video_id": f"v{i}"})
+
+    assert work_queue.run_worker(db_path, poll_interval=0.01) == 20
+    progress = work_queue.get_progress(conn)
+    assert all(progress[job_type]["done"] == 5 for job_type in work_queue.JOB_TYPES)
+    conn.close()
@@ -0,0 +1,516 @@
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+from typing import Dict, List, Optional
+
+# Pipeline stages, in order. Each handler's follow-up jobs feed the next stage.
+JOB_TYPES = ["scrape", "chunk", "embed", "upsert"]
+
+DEFAULT_DB_PATH = "data/queue.db"
+DEFAULT_MODEL = "multi-qa-mpnet-base-dot-v1"
+DEFAULT_INDEX = "fitness-chatbot-enhanced"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_type TEXT NOT NULL,
+    job_key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires_at REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    UNIQUE (job_type, job_key)
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, available_at);
+"""
+
+
+def connect(db_path: str = DEFAULT_DB_PATH) -> sqlite3.Connection:
+    """Open the queue database, creating the schema on first use.
+
+    Uses SQLite's default rollback journal rather than WAL, which needs shared
+    memory and so cannot work across hosts at all. Sharing the file between
+    hosts is still only safe on storage whose POSIX advisory locks work across
+    machines; many NFS/SMB setups do not provide that.
+    """
+    db_dir = os.path.dirname(db_path)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _insert_job(conn: sqlite3.Connection, job_type: str, job_key: str, payload: Dict,
+                max_attempts: int) -> bool:
+    now = time.time()
+    cursor = conn.execute(
+        "INSERT OR IGNORE INTO jobs (job_type, job_key, payload, max_attempts, available_at, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (job_type, job_key, json.dumps(payload), max_attempts, now, now),
+    )
+    return cursor.rowcount == 1
+
+
+def enqueue(conn: sqlite3.Connection, job_type: str, job_key: str, payload: Dict,
+            max_attempts: int = 5) -> bool:
+    """Add a job unless one with the same type and key already exists.
+
+    Returns True if a new job was created.
+    """
+    if job_type not in JOB_TYPES:
+        raise ValueError(f"Unknown job type: {job_type}")
+    return _insert_job(conn, job_type, job_key, payload, max_attempts)
+
+
+def claim_job(conn: sqlite3.Connection, worker_id: str, job_types: Optional[List[str]] = None,
+              lease_seconds: float = 600) -> Optional[Dict]:
+    """Lease the oldest runnable job, or return None if nothing is runnable.
+
+    A job is runnable when it is pending and due, or when a previous worker's
+    lease has expired: the worker crashed, or its handler ran past the
+    worker's max_job_seconds and lease renewal stopped. Jobs that have used up
+    their attempts are marked failed instead of being handed out again.
+    """
+    job_types = job_types or JOB_TYPES
+    placeholders = ",".join("?" for _ in job_types)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        while True:
+            now = time.time()
+            row = conn.execute(
+                f"SELECT * FROM jobs WHERE job_type IN ({placeholders}) AND ("
+                "(status = 'pending' AND available_at <= ?) OR "
+                "(status = 'running' AND lease_expires_at < ?)"
+                ") ORDER BY id LIMIT 1",
+                (*job_types, now, now),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            if row["attempts"] >= row["max_attempts"]:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', lease_owner = NULL, finished_at = ?, "
+                    "last_error = COALESCE(last_error, 'lease expired') WHERE id = ?",
+                    (now, row["id"]),
+                )
+                continue
+            conn.execute(
+                "UPDATE jobs SET status = 'running', lease_owner = ?, lease_expires_at = ?, "
+                "attempts = attempts + 1, started_at = ? WHERE id = ?",
+                (worker_id, now + lease_seconds, now, row["id"]),
+            )
+            conn.execute("COMMIT")
+            job = dict(row)
+            job["payload"] = json.loads(job["payload"])
+            job["attempts"] += 1
+            return job
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def complete_job(conn: sqlite3.Connection, job: Dict, worker_id: str, follow_ups: List[Dict] = ()) -> bool:
+    """Mark a job done and enqueue its follow-up jobs in one transaction.
+
+    Only the current lease holder can complete a job. If the lease was lost
+    (another worker picked the job up after expiry) this is a no-op and
+    returns False; handlers are idempotent, so the duplicate work is harmless.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        cursor = conn.execute(
+            "UPDATE jobs SET status = 'done', lease_owner = NULL, lease_expires_at = NULL, "
+            "last_error = NULL, finished_at = ? WHERE id = ? AND status = 'running' AND lease_owner = ?",
+            (time.time(), job["id"], worker_id),
+        )
+        completed = cursor.rowcount == 1
+        if completed:
+            for follow_up in follow_ups:
+                _insert_job(conn, follow_up["job_type"], follow_up["job_key"], follow_up["payload"],
+                            job["max_attempts"])
+        conn.execute("COMMIT")
+        return completed
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def extend_lease(conn: sqlite3.Connection, job: Dict, worker_id: str, lease_seconds: float) -> bool:
+    """Push back a running job's lease expiry; returns False if the lease was lost."""
+    cursor = conn.execute(
+        "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND status = 'running' AND lease_owner = ?",
+        (time.time() + lease_seconds, job["id"], worker_id),
+    )
+    return cursor.rowcount == 1
+
+
+def fail_job(conn: sqlite3.Connection, job: Dict, worker_id: str, error: str,
+             retry_delay: float = 30) -> None:
+    """Release a failed job for retry with exponential backoff, or give up on it."""
+    now = time.time()
+    if job["attempts"] >= job["max_attempts"]:
+        status, available_at = "failed", now
+    else:
+        status, available_at = "pending", now + retry_delay * 2 ** (job["attempts"] - 1)
+    conn.execute(
+        "UPDATE jobs SET status = ?, available_at = ?, lease_owner = NULL, lease_expires_at = NULL, "
+        "last_error = ?, finished_at = ? WHERE id = ? AND status = 'running' AND lease_owner = ?",
+        (status, available_at, error, now if status == "failed" else None, job["id"], worker_id),
+    )
+
+
+def retry_failed(conn: sqlite3.Connection, job_type: Optional[str] = None) -> int:
+    """Put failed jobs back in the queue with a fresh attempt budget."""
+    query = "UPDATE jobs SET status = 'pending', attempts = 0, available_at = ? WHERE status = 'failed'"
+    params = [time.time()]
+    if job_type:
+        query += " AND job_type = ?"
+        params.append(job_type)
+    return conn.execute(query, params).rowcount
+
+
+def get_progress(conn: sqlite3.Connection) -> Dict[str, Dict]:
+    """Job counts per status and throughput of completed jobs, per stage."""
+    progress = {job_type: {"pending": 0, "running": 0, "done": 0, "failed": 0} for job_type in JOB_TYPES}
+    for row in conn.execute("SELECT job_type, status, COUNT(*) AS n FROM jobs GROUP BY job_type, status"):
+        progress[row["job_type"]][row["status"]] = row["n"]
+
+    for row in conn.execute(
+        "SELECT job_type, COUNT(*) AS n, MIN(started_at) AS first_start, MAX(finished_at) AS last_finish, "
+        "AVG(finished_at - started_at) AS avg_seconds FROM jobs WHERE status = 'done' GROUP BY job_type"
+    ):
+        elapsed = row["last_finish"] - row["first_start"]
+        stage = progress[row["job_type"]]
+        stage["jobs_per_minute"] = row["n"] / elapsed * 60 if elapsed > 0 else 0.0
+        stage["avg_seconds"] = row["avg_seconds"]
+    return progress
+
+
+def print_progress(conn: sqlite3.Connection):
+    print(f"{'stage':<8} {'pending':>8} {'running':>8} {'done':>8} {'failed':>8} {'jobs/min':>9} {'avg s':>7}")
+    for job_type, stage in get_progress(conn).items():
+        print(f"{job_type:<8} {stage['pending']:>8} {stage['running']:>8} {stage['done']:>8} "
+              f"{stage['failed']:>8} {stage.get('jobs_per_minute', 0.0):>9.1f} "
+              f"{stage.get('avg_seconds') or 0.0:>7.2f}")
+
+
+# Job handlers. Each takes the job payload and returns the follow-up jobs to
+# enqueue. They write to deterministic paths and vector ids, so running the
+# same job twice produces the same result.
+
+_models = {}
+_indexes = {}
+
+
+def _get_model(model_name: str):
+    if model_name not in _models:
+        from sentence_transformers import SentenceTransformer
+        _models[model_name] = SentenceTransformer(model_name)
+    return _models[model_name]
+
+
+def _get_index(index_name: str):
+    if index_name not in _indexes:
+        from pinecone import Pinecone
+        pc = Pinecone(api_key=os.environ.get("PINECONE_API_KEY"))
+        _indexes[index_name] = pc.Index(index_name)
+    return _indexes[index_name]
+
+
+def handle_scrape(payload: Dict) -> List[Dict]:
+    from youtube_scraper import scrape_video
+
+    os.makedirs(payload["raw_dir"], exist_ok=True)
+    # Rate limits and network errors on the transcript fetch raise, so the
+    # queue retries them instead of recording the video as non-English
+    video_data = scrape_video(payload["video_id"], payload["raw_dir"], raise_transient_errors=True)
+    # Non-English videos and videos without a transcript have nothing to chunk
+    if video_data is None or not video_data["transcript"]:
+        return []
+    return [{"job_type": "chunk", "job_key": payload["video_id"], "payload": payload}]
+
+
+def handle_chunk(payload: Dict) -> List[Dict]:
+    from chunking import create_enriched_chunks, load_json_file
+
+    video_id = payload["video_id"]
+    video_data = load_json_file(os.path.join(payload["raw_dir"], f"{video_id}.json"))
+    enriched_chunks = create_enriched_chunks(video_data)
+
+    os.makedirs(payload["chunks_dir"], exist_ok=True)
+    output_path = os.path.join(payload["chunks_dir"], f"enriched_{video_id}.json")
+    _write_json_atomic(output_path, enriched_chunks, indent=2)
+    return [_embed_job(payload)]
+
+
+def _embed_job(payload: Dict) -> Dict:
+    # Keyed by target index as well as model, so the same model can be embedded
+    # into a second index (e.g. after fixing a wrong --index-name)
+    return {
+        "job_type": "embed",
+        "job_key": f"{payload['video_id']}:{payload['model_name']}:{payload['index_name']}",
+        "payload": payload,
+    }
+
+
+def handle_embed(payload: Dict) -> List[Dict]:
+    from chunking import load_json_file
+
+    video_id = payload["video_id"]
+    chunks = load_json_file(os.path.join(payload["chunks_dir"], f"enriched_{video_id}.json"))
+    model = _get_model(payload["model_name"])
+    embeddings = model.encode([chunk["content"] for chunk in chunks])
+
+    vectors = [
+        {
+            "id": f"{chunk['metadata']['video_id']}_{chunk['metadata']['chunk_number']}",
+            "values": embedding.tolist(),
+            "metadata": chunk["metadata"],
+        }
+        for chunk, embedding in zip(chunks, embeddings)
+    ]
+    embeddings_dir = os.path.join(payload["embeddings_dir"], payload["model_name"])
+    os.makedirs(embeddings_dir, exist_ok=True)
+    _write_json_atomic(os.path.join(embeddings_dir, f"{video_id}.json"), vectors)
+    return [{
+        "job_type": "upsert",
+        "job_key": f"{video_id}:{payload['model_name']}:{payload['index_name']}",
+        "payload": payload,
+    }]
+
+
+def handle_upsert(payload: Dict) -> List[Dict]:
+    from chunking import load_json_file
+
+    embeddings_path = os.path.join(payload["embeddings_dir"], payload["model_name"], f"{payload['video_id']}.json")
+    vectors = load_json_file(embeddings_path)
+    index = _get_index(payload["index_name"])
+
+    # Vector ids are deterministic, so re-upserting overwrites rather than duplicates
+    batch_size = 100
+    for i in range(0, len(vectors), batch_size):
+        index.upsert(vectors=vectors[i:i+batch_size])
+    return []
+
+
+JOB_HANDLERS = {
+    "scrape": handle_scrape,
+    "chunk": handle_chunk,
+    "embed": handle_embed,
+    "upsert": handle_upsert,
+}
+
+
+def _write_json_atomic(path: str, data, indent: Optional[int] = None):
+    """Write via a temporary file so readers never see a half-written file."""
+    # Hostname as well as pid, since workers on other hosts share the directory
+    tmp_path = f"{path}.{socket.gethostname()}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+    os.replace(tmp_path, path)
+
+
+def run_worker(db_path: str = DEFAULT_DB_PATH, job_types: Optional[List[str]] = None,
+               lease_seconds: float = 600, poll_interval: float = 5, exit_when_empty: bool = True,
+               max_job_seconds: float = 3600, worker_id: Optional[str] = None) -> int:
+    """Drain the queue until it is empty (or forever, if exit_when_empty is False).
+
+    Leases are renewed while a handler runs, for at most max_job_seconds; a
+    handler that hangs past that lets its lease expire so another worker can
+    take the job over. Returns the number of jobs this worker completed.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    conn = connect(db_path)
+    completed = 0
+    while True:
+        job = claim_job(conn, worker_id, job_types, lease_seconds)
+        if job is None:
+            if exit_when_empty and not _has_unfinished_jobs(conn, job_types):
+                break
+            time.sleep(poll_interval)
+            continue
+
+        # Keep the lease alive while the handler runs, so a slow job is not
+        # reclaimed by another worker just for outliving lease_seconds
+        stop_renewing = threading.Event()
+        renewer = threading.Thread(target=_renew_lease,
+                                   args=(db_path, job, worker_id, lease_seconds, max_job_seconds, stop_renewing),
+                                   daemon=True)
+        renewer.start()
+        try:
+            follow_ups = JOB_HANDLERS[job["job_type"]](job["payload"])
+        except Exception as e:
+            print(f"[{worker_id}] {job['job_type']} {job['job_key']} failed "
+                  f"(attempt {job['attempts']}/{job['max_attempts']}): {str(e)}")
+            fail_job(conn, job, worker_id, traceback.format_exc())
+            continue
+        finally:
+            stop_renewing.set()
+            renewer.join()
+
+        if complete_job(conn, job, worker_id, follow_ups):
+            completed += 1
+        else:
+            print(f"[{worker_id}] Lease lost for {job['job_type']} {job['job_key']}; result discarded")
+
+    conn.close()
+    print(f"[{worker_id}] Finished. Jobs completed: {completed}")
+    return completed
+
+
+def _renew_lease(db_path: str, job: Dict, worker_id: str, lease_seconds: float, max_job_seconds: float,
+                 stop: threading.Event):
+    """Extend a job's lease every third of lease_seconds until stopped, lost or past max_job_seconds."""
+    deadline = time.time() + max_job_seconds
+    conn = connect(db_path)
+    try:
+        while not stop.wait(lease_seconds / 3):
+            if time.time() >= deadline or not extend_lease(conn, job, worker_id, lease_seconds):
+                break
+    finally:
+        conn.close()
+
+
+def _has_unfinished_jobs(conn: sqlite3.Connection, job_types: Optional[List[str]]) -> bool:
+    """Whether pending or running jobs remain, e.g. backing off or leased elsewhere.
+
+    When a worker only drains later stages, earlier stages still count, since
+    they may yet produce work for it.
+    """
+    job_types = job_types or JOB_TYPES
+    first_stage = min(JOB_TYPES.index(job_type) for job_type in job_types)
+    watched = JOB_TYPES[first_stage:]
+    placeholders = ",".join("?" for _ in watched)
+    row = conn.execute(
+        f"SELECT 1 FROM jobs WHERE job_type IN ({placeholders}) AND status IN ('pending', 'running') LIMIT 1",
+        watched,
+    ).fetchone()
+    return row is not None
+
+
+def _base_payload(args) -> Dict:
+    return {
+        "raw_dir": args.raw_dir,
+        "chunks_dir": args.chunks_dir,
+        "embeddings_dir": args.embeddings_dir,
+        "model_name": args.model_name,
+        "index_name": args.index_name,
+    }
+
+
+def _enqueue_embed(conn: sqlite3.Connection, payload: Dict) -> bool:
+    job = _embed_job(payload)
+    return enqueue(conn, job["job_type"], job["job_key"], job["payload"])
+
+
+def seed_channel(conn: sqlite3.Connection, channel_id: str, payload: Dict) -> int:
+    """Enqueue a scrape job for every upload on a channel.
+
+    Videos that are already chunked skip straight to an embed job, so seeding
+    the channel again for another model or index does not re-scrape them.
+    """
+    from youtube_scraper import get_all_video_ids, get_channel_upload_playlist_id
+
+    created = 0
+    for video_id in get_all_video_ids(get_channel_upload_playlist_id(channel_id)):
+        video_payload = {**payload, "video_id": video_id}
+        if os.path.exists(os.path.join(payload["chunks_dir"], f"enriched_{video_id}.json")):
+            created += _enqueue_embed(conn, video_payload)
+        else:
+            created += enqueue(conn, "scrape", video_id, video_payload)
+    return created
+
+
+def seed_chunks(conn: sqlite3.Connection, payload: Dict) -> int:
+    """Enqueue embed jobs for already-chunked videos, e.g. to re-embed with a new model."""
+    created = 0
+    for filename in os.listdir(payload["chunks_dir"]):
+        if filename.startswith('enriched_') and filename.endswith('.json'):
+            video_id = filename[len('enriched_'):-len('.json')]
+            created += _enqueue_embed(conn, {**payload, "video_id": video_id})
+    return created
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded scrape/chunk/embed/upsert work queue")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Queue database (shared by all workers)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    seed = subparsers.add_parser("seed", help="Enqueue jobs")
+    seed.add_argument("--channel", help="YouTube channel id to scrape")
+    seed.add_argument("--from-chunks", action="store_true", help="Embed existing chunk files")
+    seed.add_argument("--raw-dir", default="data/raw")
+    seed.add_argument("--chunks-dir", default="data/raw/chunks")
+    seed.add_argument("--embeddings-dir", default="data/embeddings")
+    seed.add_argument("--model-name", default=DEFAULT_MODEL)
+    seed.add_argument("--index-name",
+                      help=f"Pinecone index to upsert into; required unless --model-name is {DEFAULT_MODEL}")
+
+    work = subparsers.add_parser("work", help="Run worker processes")
+    work.add_argument("--processes", type=int, default=1)
+    work.add_argument("--stages", nargs="+", choices=JOB_TYPES, help="Only run these job types")
+    work.add_argument("--lease-seconds", type=float, default=600,
+                      help="Lease length; renewed while a job runs, so this bounds how long a "
+                           "crashed worker's job waits before another worker takes it over")
+    work.add_argument("--max-job-seconds", type=float, default=3600,
+                      help="Stop renewing a job's lease after this long, so a hung job is taken over "
+                           "by another worker once its lease expires")
+    work.add_argument("--forever", action="store_true", help="Keep polling when the queue is empty")
+
+    subparsers.add_parser("status", help="Show progress and per-stage throughput")
+    retry = subparsers.add_parser("retry", help="Re-queue failed jobs")
+    retry.add_argument("--stage", choices=JOB_TYPES)
+
+    args = parser.parse_args()
+    conn = connect(args.db)
+
+    if args.command == "seed":
+        if args.index_name is None:
+            # Another model's vectors must not overwrite the live index under the same ids
+            if args.model_name != DEFAULT_MODEL:
+                parser.error("--index-name is required when --model-name is not the default")
+            args.index_name = DEFAULT_INDEX
+        payload = _base_payload(args)
+        created = 0
+        if args.channel:
+            created += seed_channel(conn, args.channel, payload)
+        if args.from_chunks:
+            created += seed_chunks(conn, payload)
+        print(f"Enqueued {created} new jobs")
+    elif args.command == "work":
+        worker_args = (args.db, args.stages, args.lease_seconds, 5, not args.forever, args.max_job_seconds)
+        if args.processes == 1:
+            run_worker(*worker_args)
+        else:
+            processes = [multiprocessing.Process(target=run_worker, args=worker_args)
+                         for _ in range(args.processes)]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+        print_progress(conn)
+    elif args.command == "status":
+        print_progress(conn)
+    elif args.command == "retry":
+        print(f"Re-queued {retry_failed(conn, args.stage)} failed jobs")
+
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,10 @@ from datetime import datetime
 
 load_dotenv()
 
+# Transcript errors that will not go away on retry; anything else (rate limits,
+# network errors) is treated as transient
+PERMANENT_TRANSCRIPT_ERRORS = {'NoTranscriptFound', 'NoTranscriptAvailable', 'TranscriptsDisabled', 'VideoUnavailable'}
+
 # Set up YouTube API client
 youtube = build('youtube', 'v3', developerKey=os.getenv('YOUTUBE_API_KEY'))
 
@@ -79,9 +83,50 @@ def get_video_transcript(video_id):
         return {
             'text': None,
             'language': None,
-            'error': str(e)
+            'error': str(e),
+            'error_type': type(e).__name__
         }
 
+def scrape_video(video_id, output_dir='data/raw', raise_transient_errors=False):
+    """Fetch one video's details and transcript and save them as JSON.
+
+    Returns the saved video data, or None for non-English videos. With
+    raise_transient_errors, a transcript fetch that failed for a retryable
+    reason raises instead of the video being skipped as non-English.
+    """
+    video_details, video_statistics, thumbnail_url = get_video_details(video_id)
+    transcript_data = get_video_transcript(video_id)
+    
+    if (raise_transient_errors and transcript_data.get('error')
+            and transcript_data['error_type'] not in PERMANENT_TRANSCRIPT_ERRORS):
+        raise RuntimeError(f"Transcript fetch failed for {video_id}: {transcript_data['error']}")
+    
+    if transcript_data['language'] != 'en':
+        return None
+    
+    # Convert the publishedAt date to a more readable format
+    published_at = datetime.strptime(video_details['publishedAt'], "%Y-%m-%dT%H:%M:%SZ")
+    formatted_date = published_at.strftime("%Y-%m-%d %H:%M:%S")
+    
+    video_data = {
+        'id': video_id,
+        'title': video_details['title'],
+        'description': video_details['description'],
+        'upload_date': formatted_date,
+        'view_count': video_statistics['viewCount'],
+        'like_count': video_statistics.get('likeCount', 'N/A'),
+        'comment_count': video_statistics.get('commentCount', 'N/A'),
+        'thumbnail_url': thumbnail_url,
+        'transcript': transcript_data['text'],
+        'transcript_language': transcript_data['language'],
+        'transcript_error': transcript_data.get('error')
+    }
+    
+    with open(os.path.join(output_dir, f'{video_id}.json'), 'w', encoding='utf-8') as f:
+        json.dump(video_data, f, ensure_ascii=False, indent=4)
+    
+    return video_data
+
 def main():
     channel_id = 'UCe0TLA0EsQbE-MjuHXevj2A'  # AthleanX channel ID
     
@@ -102,37 +147,15 @@ def main():
 
     try:
         for video_id in tqdm(all_video_ids, desc="Processing videos"):
-            video_details, video_statistics, thumbnail_url = get_video_details(video_id)
-            transcript_data = get_video_transcript(video_id)
+            video_data = scrape_video(video_id)
             
             # Skip non-English videos
-            if transcript_data['language'] != 'en':
+            if video_data is None:
                 continue
             
             english_videos += 1
             
-            # Convert the publishedAt date to a more readable format
-            published_at = datetime.strptime(video_details['publishedAt'], "%Y-%m-%dT%H:%M:%SZ")
-            formatted_date = published_at.strftime("%Y-%m-%d %H:%M:%S")
-            
-            video_data = {
-                'id': video_id,
-                'title': video_details['title'],
-                'description': video_details['description'],
-                'upload_date': formatted_date,
-                'view_count': video_statistics['viewCount'],
-                'like_count': video_statistics.get('likeCount', 'N/A'),
-                'comment_count': video_statistics.get('commentCount', 'N/A'),
-                'thumbnail_url': thumbnail_url,
-                'transcript': transcript_data['text'],
-                'transcript_language': transcript_data['language'],
-                'transcript_error': transcript_data.get('error')
-            }
-            
-            with open(f'data/raw/{video_id}.json', 'w', encoding='utf-8') as f:
-                json.dump(video_data, f, ensure_ascii=False, indent=4)
-            
-            if transcript_data['text']:
+            if video_data['transcript']:
                 videos_with_transcript += 1
             else:
                 videos_without_transcript += 1